@@ -4,10 +4,13 @@
 Flask app for Pokemon A* Phase 2.
 Run: python3 app.py
 Visit: http://127.0.0.1:5000
+Requires flask[async] for the async /api/new view.
 """
 
 from flask import Flask, jsonify, render_template, send_from_directory
+import asyncio
 import random
+from collections import deque
 import heapq
 import os
 
@@ -22,30 +25,28 @@ TILE_WALL = '#'
 TILE_MUD = '~'
 
 COSTS = {TILE_NORMAL: 1, TILE_MUD: 3}
+COST_WALL = 255  # sentinel for impassable tiles in A*'s flat cost table
+# byte -> step cost, for building that table with bytes.translate
+COST_TABLE = bytes(COST_WALL if chr(i) == TILE_WALL else COSTS.get(chr(i), 1) for i in range(256))
 
-# if True, server will include the recorded steps in the JSON (large). Keep False for normal use.
+# if True, server will include the recorded steps in the JSON as per-step deltas:
+# [current, [[cell, g], ...]] (cells whose g improved while expanding current). Keep False for normal use.
 INCLUDE_STEPS = False
 
 # ---------------- App ----------------
 app = Flask(__name__, static_folder="static", template_folder="templates")
+# resolved once; the frontend itself loads sprites from /static/sprites/
+SPRITES_DIR = os.path.join(app.root_path, "static", "sprites")
 
 # ---- Utilities / path helpers ----
-def manhattan(a, b):
-    return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
 def generate_grid(rows, cols, wall_prob, mud_prob, seed=None):
     if seed is not None:
         random.seed(seed)
-    grid = [[TILE_NORMAL for _ in range(cols)] for _ in range(rows)]
-    for r in range(rows):
-        for c in range(cols):
-            rnum = random.random()
-            if rnum < wall_prob:
-                grid[r][c] = TILE_WALL
-            else:
-                if random.random() < mud_prob:
-                    grid[r][c] = TILE_MUD
-    return grid
+    rand = random.random
+    # one wall draw per cell, plus a mud draw for non-wall cells (same draw order as a per-cell loop)
+    return [[TILE_WALL if rand() < wall_prob else (TILE_MUD if rand() < mud_prob else TILE_NORMAL)
+             for _ in range(cols)]
+            for _ in range(rows)]
 
 def random_empty_cell(grid):
     rows = len(grid); cols = len(grid[0])
@@ -57,10 +58,10 @@ def random_empty_cell(grid):
 
 def ensure_reachable(grid, start, goal):
     rows = len(grid); cols = len(grid[0])
-    q = [start]
+    q = deque([start])
     seen = set([start])
     while q:
-        cr, cc = q.pop(0)
+        cr, cc = q.popleft()
         if (cr, cc) == goal:
             return True
         for dr, dc in [(1,0),(-1,0),(0,1),(0,-1)]:
@@ -71,8 +72,34 @@ def ensure_reachable(grid, start, goal):
                     q.append((nr,nc))
     return False
 
+def label_components(grid):
+    # label 4-connected regions of non-wall cells once per grid (0 = wall);
+    # two cells are mutually reachable iff they share a label
+    rows = len(grid); cols = len(grid[0])
+    labels = [[0] * cols for _ in range(rows)]
+    label = 0
+    for r in range(rows):
+        for c in range(cols):
+            if grid[r][c] == TILE_WALL or labels[r][c]:
+                continue
+            label += 1
+            labels[r][c] = label
+            q = deque([(r, c)])
+            while q:
+                cr, cc = q.popleft()
+                for dr, dc in ((1,0),(-1,0),(0,1),(0,-1)):
+                    nr, nc = cr+dr, cc+dc
+                    if 0 <= nr < rows and 0 <= nc < cols:
+                        if grid[nr][nc] != TILE_WALL and not labels[nr][nc]:
+                            labels[nr][nc] = label
+                            q.append((nr, nc))
+    return labels
+
 def place_entities_on_grid(rows, cols, wall_prob, mud_prob, seed=None, max_place_tries=300):
     grid = generate_grid(rows, cols, wall_prob, mud_prob, seed)
+    # the first pair on a grid is usually reachable, so try an early-exit BFS first and only
+    # label the whole grid once a pair fails (later attempts are then a label compare)
+    labels = None
     tries = 0
     while True:
         start = random_empty_cell(grid)
@@ -81,66 +108,89 @@ def place_entities_on_grid(rows, cols, wall_prob, mud_prob, seed=None, max_place
             tries += 1
             if tries > max_place_tries:
                 grid = generate_grid(rows, cols, wall_prob, mud_prob, None)
+                labels = None
                 tries = 0
             continue
-        if ensure_reachable(grid, start, goal):
+        if labels is None:
+            reachable = ensure_reachable(grid, start, goal)
+            if not reachable:
+                labels = label_components(grid)
+        else:
+            reachable = labels[start[0]][start[1]] == labels[goal[0]][goal[1]]
+        if reachable:
             return grid, start, goal
         else:
             tries += 1
             if tries > max_place_tries:
                 grid = generate_grid(rows, cols, wall_prob, mud_prob, None)
+                labels = None
                 tries = 0
 
+def reconstruct_path(parent, idx, cols):
+    # follow packed parent indices back to the start (parent -1) and decode to (r, c)
+    path = [idx]
+    while parent[path[-1]] != -1:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return [divmod(i, cols) for i in path]
+
 # A* implementation
 def astar(grid, start, goal, record_steps=False):
     rows = len(grid); cols = len(grid[0])
-    g = {start: 0}
-    parent = {}
-    open_heap = []
-    heapq.heappush(open_heap, (manhattan(start, goal), 0, start))
-    open_set = {start}
-    closed_set = set()
-    steps = []
+    inf = float('inf')
+    # nodes are packed as r*cols + c; g-scores and parents are flat arrays over them
+    sidx = start[0]*cols + start[1]
+    gidx = goal[0]*cols + goal[1]
+    n = rows * cols
+    # per-cell step cost, built once (at C speed) so the inner loop is a single index
+    cost = ''.join(map(''.join, grid)).encode('ascii').translate(COST_TABLE)
+    gr, gc = goal
+    offsets = (cols, -cols, 1, -1)  # down, up, right, left
+    g = [inf] * n
+    parent = [-1] * n
+    g[sidx] = 0
+    open_heap = [(abs(start[0] - gr) + abs(start[1] - gc), 0, sidx)]
+    expanded = 0
+    # hot-loop names bound to locals (avoids global/attribute lookups per edge)
+    push = heapq.heappush
+    pop = heapq.heappop
+    steps = []  # each step: (current, [(cell, new g), ...] improved while expanding it)
     while open_heap:
-        f, _, current = heapq.heappop(open_heap)
-        if current in closed_set:
+        f, popped_g, cur = pop(open_heap)
+        # with a consistent heuristic the first pop of the goal carries its best g
+        if cur == gidx:
+            if record_steps:
+                steps.append((divmod(cur, cols), []))
+            return {'path': reconstruct_path(parent, cur, cols), 'expanded': expanded + 1, 'steps': steps}
+        # stale entry: a cheaper g for this node was pushed after this one
+        if g[cur] < popped_g:
             continue
-        open_set.discard(current)
-        closed_set.add(current)
+        expanded += 1
 
         if record_steps:
-            steps.append({
-                'current': current,
-                'open': list(open_set),
-                'closed': list(closed_set),
-                'g': dict(g)
-            })
-
-        if current == goal:
-            path = []
-            cur = current
-            while cur != start:
-                path.append(cur)
-                cur = parent[cur]
-            path.append(start)
-            path.reverse()
-            return {'path': path, 'expanded': len(closed_set), 'steps': steps}
-
-        cr, cc = current
-        for dr, dc in ((1,0),(-1,0),(0,1),(0,-1)):
-            nr, nc = cr+dr, cc+dc
-            if not (0 <= nr < rows and 0 <= nc < cols):
+            g_updates = []
+            steps.append((divmod(cur, cols), g_updates))
+
+        cr, cc = divmod(cur, cols)
+        for step in offsets:
+            nidx = cur + step
+            if not (0 <= nidx < n):
                 continue
-            if grid[nr][nc] == TILE_WALL:
+            nr, nc = divmod(nidx, cols)
+            # +/-1 must stay on the same row (no wrap-around to the next/previous row)
+            if nr != cr and nc != cc:
                 continue
-            neighbor = (nr, nc)
-            tentative_g = g[current] + COSTS.get(grid[nr][nc], 1)
-            if tentative_g < g.get(neighbor, float('inf')):
-                g[neighbor] = tentative_g
-                parent[neighbor] = current
-                fscore = tentative_g + manhattan(neighbor, goal)
-                heapq.heappush(open_heap, (fscore, tentative_g, neighbor))
-                open_set.add(neighbor)
+            ci = cost[nidx]
+            if ci == COST_WALL:
+                continue
+            tentative_g = popped_g + ci
+            if tentative_g < g[nidx]:
+                g[nidx] = tentative_g
+                parent[nidx] = cur
+                fscore = tentative_g + abs(nr - gr) + abs(nc - gc)
+                push(open_heap, (fscore, tentative_g, nidx))
+                if record_steps:
+                    g_updates.append((divmod(nidx, cols), tentative_g))
     return None
 
 # Convert grid to simple JSON-friendly structure
@@ -148,18 +198,24 @@ def grid_to_json(grid):
     return {"rows": len(grid), "cols": len(grid[0]), "cells": grid}
 
 # ---- Routes ----
+_seeded_responses = {}  # SEED -> /api/new response body
+
 @app.route("/")
 def index():
     return render_template("index.html")
 
 @app.route("/api/new")
-def api_new():
+async def api_new():
     """Generate a new grid, place start/goal, run solver, return everything to frontend."""
     if SEED is not None:
+        # seeded runs are deterministic, so the whole response can be reused
+        if SEED in _seeded_responses:
+            return jsonify(_seeded_responses[SEED])
         random.seed(SEED)
-    grid, start, goal = place_entities_on_grid(ROWS, COLS, WALL_PROB, MUD_PROB, SEED)
+    # grid generation and A* are CPU-bound; run them off the event loop
+    grid, start, goal = await asyncio.to_thread(place_entities_on_grid, ROWS, COLS, WALL_PROB, MUD_PROB, SEED)
     # run A*
-    res = astar(grid, start, goal, record_steps=INCLUDE_STEPS)
+    res = await asyncio.to_thread(astar, grid, start, goal, INCLUDE_STEPS)
     if not res:
         return jsonify({"error": "no path found (unexpected)"}), 500
     out = {
@@ -171,14 +227,15 @@ def api_new():
     }
     if INCLUDE_STEPS:
         out["steps"] = res["steps"]
+    if SEED is not None:
+        _seeded_responses[SEED] = out
     return jsonify(out)
 
 @app.route("/sprites/<path:filename>")
 def sprites(filename):
-    static_dir = os.path.join(app.root_path, "static", "sprites")
-    return send_from_directory(static_dir, filename)
+    return send_from_directory(SPRITES_DIR, filename)
 
 # ---- Run app ----
 if __name__ == "__main__":
-    os.makedirs(os.path.join("static", "sprites"), exist_ok=True)
+    os.makedirs(SPRITES_DIR, exist_ok=True)
     app.run(debug=True)
@@ -12,6 +12,7 @@ Outputs:
 """
 import os
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import numpy as np
 
@@ -25,46 +26,35 @@ DIR_ORDER = ["down", "left", "right", "up"]  # fixed mapping for rows
 def load_image(path):
     return Image.open(path).convert("RGBA")
 
-def guess_bg_color(im):
-    w, h = im.size
-    corners = [im.getpixel((0,0)), im.getpixel((w-1,0)), im.getpixel((0,h-1)), im.getpixel((w-1,h-1))]
+def guess_bg_color(arr):
+    # arr: H x W x 4 array of the sheet
+    corners = [arr[0,0].tolist(), arr[0,-1].tolist(), arr[-1,0].tolist(), arr[-1,-1].tolist()]
     if any(c[3] < 255 for c in corners):
         return None
     rgb = [(c[0], c[1], c[2]) for c in corners]
     return Counter(rgb).most_common(1)[0][0]
 
-def make_mask(im, bg_color):
-    arr = np.array(im)  # H x W x 4
+def make_mask(arr, bg_color):
+    # arr: H x W x 4 array of the sheet
     if bg_color is None:
         mask = arr[...,3] > 0
     else:
-        bg = np.array(bg_color, dtype=np.uint8)
-        mask = np.any(arr[...,:3] != bg.reshape((1,1,3)), axis=2)
-    return mask.astype(np.uint8)
+        # per-channel compare + OR, avoiding an H x W x 3 intermediate
+        mask = (arr[...,0] != bg_color[0]) | (arr[...,1] != bg_color[1]) | (arr[...,2] != bg_color[2])
+    return mask
 
 def find_segments_1d(bool_arr, min_len=1):
-    segs = []
-    inside = False
-    start = 0
-    for i, v in enumerate(bool_arr):
-        if v and not inside:
-            inside = True
-            start = i
-        elif not v and inside:
-            inside = False
-            end = i-1
-            if end - start + 1 >= min_len:
-                segs.append((start, end))
-    if inside:
-        end = len(bool_arr)-1
-        if end - start + 1 >= min_len:
-            segs.append((start, end))
-    return segs
+    # runs of True: +1/-1 edges of the zero-padded array mark run starts/ends
+    d = np.diff(np.concatenate(([0], np.asarray(bool_arr, dtype=np.int8), [0])))
+    starts = np.flatnonzero(d == 1)
+    ends = np.flatnonzero(d == -1) - 1
+    keep = (ends - starts + 1) >= min_len
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
 
-def crop_grid_cells(im, mask):
-    # mask: HxW of 0/1
-    row_presence = mask.sum(axis=1) > 0
-    col_presence = mask.sum(axis=0) > 0
+def crop_grid_cells(arr, mask):
+    # arr: H x W x 4 array of the sheet; mask: HxW bool
+    row_presence = mask.any(axis=1)
+    col_presence = mask.any(axis=0)
     row_segs = find_segments_1d(row_presence)
     col_segs = find_segments_1d(col_presence)
 
@@ -74,10 +64,9 @@ def crop_grid_cells(im, mask):
     cells = []  # list of dicts {row_idx, col_idx, image, bbox_sheet}
     for r_idx, (r0, r1) in enumerate(row_segs):
         for c_idx, (c0, c1) in enumerate(col_segs):
-            # crop sheet region
-            crop = im.crop((c0, r0, c1+1, r1+1))
+            # crop sheet region (a view; PIL is only touched for the final cell image)
+            ca = arr[r0:r1+1, c0:c1+1]
             # tighten crop to non-background inside the cell
-            ca = np.array(crop)
             alpha = ca[...,3]
             if alpha.max() == 0:
                 non_bg = np.any(ca[...,:3] != 0, axis=2)
@@ -88,9 +77,9 @@ def crop_grid_cells(im, mask):
             if ys.size and xs.size:
                 ty0, ty1 = ys[0], ys[-1]
                 tx0, tx1 = xs[0], xs[-1]
-                tight = crop.crop((int(tx0), int(ty0), int(tx1)+1, int(ty1)+1))
+                tight = Image.fromarray(ca[ty0:ty1+1, tx0:tx1+1])
             else:
-                tight = crop
+                tight = Image.fromarray(ca)
             cells.append({
                 "row_index": r_idx,
                 "col_index": c_idx,
@@ -111,13 +100,16 @@ def save_cells_fixed_order(cells, row_count):
         rows[r].sort(key=lambda x: x["col_index"])
 
     mapping_lines = []
+    jobs = []  # (image, output path)
     for r_idx in sorted(rows.keys()):
         dir_name = DIR_ORDER[r_idx] if r_idx < len(DIR_ORDER) else f"row{r_idx}"
         for i, cell in enumerate(rows[r_idx]):
             fname = f"ash_{dir_name}_{i}.png"
-            outp = os.path.join(OUT_DIR, fname)
-            cell["image"].save(outp)
+            jobs.append((cell["image"], os.path.join(OUT_DIR, fname)))
             mapping_lines.append(f"{fname} <- row {r_idx} col {cell['col_index']} bbox {cell['bbox_sheet']}")
+    # PNG encoding releases the GIL, so saves overlap across threads
+    with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, max(len(jobs), 1))) as ex:
+        list(ex.map(lambda job: job[0].save(job[1]), jobs))
     # write mapping
     with open(os.path.join(OUT_DIR, "mapping.txt"), "w") as f:
         f.write("\n".join(mapping_lines))
@@ -126,10 +118,11 @@ def save_cells_fixed_order(cells, row_count):
 
 def main():
     im = load_image(IN_PATH)
-    bg = guess_bg_color(im)
+    arr = np.asarray(im)  # H x W x 4, shared by bg detection and masking
+    bg = guess_bg_color(arr)
     print("Background:", "transparent" if bg is None else bg)
-    mask = make_mask(im, bg)
-    cells, rows, cols = crop_grid_cells(im, mask)
+    mask = make_mask(arr, bg)
+    cells, rows, cols = crop_grid_cells(arr, mask)
     print(f"Detected grid: {len(rows)} rows x {len(cols)} cols -> {len(cells)} cells")
     save_cells_fixed_order(cells, len(rows))
 
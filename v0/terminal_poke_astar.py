@@ -15,9 +15,13 @@ Notes:
 """
 
 import random
+from collections import deque
 import heapq
+import io
+import sys
 import time
 import os
+import atexit
 from datetime import datetime
 
 # --- Config ---
@@ -44,14 +48,36 @@ COSTS = {
     TILE_NORMAL: 1,
     TILE_MUD: 3,
 }
+COST_WALL = 255  # sentinel for impassable tiles in A*'s flat cost table
+# byte -> step cost, for building that table with bytes.translate
+COST_TABLE = bytes(COST_WALL if chr(i) == TILE_WALL else COSTS.get(chr(i), 1) for i in range(256))
 
 # --- Utilities ---
 def clear_console():
     os.system('cls' if os.name == 'nt' else 'clear')
 
-def manhattan(a, b):
-    # careful arithmetic per policy (simple but explicit)
-    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+def draw_frame(frame, prev=None):
+    # draw a multi-line frame in place with ANSI cursor moves; with a previous
+    # frame, only the characters that changed are rewritten. Returns frame.
+    if prev is None:
+        out = ['\x1b[2J\x1b[H', frame, '\n']  # clear once, full draw
+    else:
+        out = []
+        lines = frame.split('\n')
+        old_lines = prev.split('\n')
+        for r, line in enumerate(lines):
+            old = old_lines[r] if r < len(old_lines) else ''
+            if line == old:
+                continue
+            for c, ch in enumerate(line):
+                if c >= len(old) or old[c] != ch:
+                    out.append(f'\x1b[{r+1};{c+1}H{ch}')
+            if len(line) < len(old):
+                out.append(f'\x1b[{r+1};{len(line)+1}H\x1b[K')
+        out.append(f'\x1b[{len(lines)+1};1H')  # park cursor below the frame
+    sys.stdout.write(''.join(out))
+    sys.stdout.flush()
+    return frame
 
 def nowstr():
     return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -63,31 +89,32 @@ class Logger:
         # open/overwrite at start
         with open(self.filename, 'w', encoding='utf-8') as f:
             f.write(f"Log start: {nowstr()}\n\n")
+        # keep one line-buffered handle open instead of reopening per message; append
+        # mode so writes land at the end even when main() appends via its own handles
+        self.fh = open(self.filename, 'a', encoding='utf-8', buffering=1)
 
     def log(self, message, console=True):
         line = f"{nowstr()} | {message}"
         if console:
             print(message)
-        with open(self.filename, 'a', encoding='utf-8') as f:
-            f.write(line + "\n")
+        self.fh.write(line + "\n")
+
+    def close(self):
+        self.fh.close()
 
 logger = Logger(OUTFILE)
+atexit.register(logger.close)
 
 # --- Grid generation ---
 def generate_grid(rows, cols, wall_prob, mud_prob, seed=None):
     # If seed provided, we use it once per generation call
     if seed is not None:
         random.seed(seed)
-    grid = [[TILE_NORMAL for _ in range(cols)] for _ in range(rows)]
-    for r in range(rows):
-        for c in range(cols):
-            rnum = random.random()
-            if rnum < wall_prob:
-                grid[r][c] = TILE_WALL
-            else:
-                if random.random() < mud_prob:
-                    grid[r][c] = TILE_MUD
-    return grid
+    rand = random.random
+    # one wall draw per cell, plus a mud draw for non-wall cells (same draw order as a per-cell loop)
+    return [[TILE_WALL if rand() < wall_prob else (TILE_MUD if rand() < mud_prob else TILE_NORMAL)
+             for _ in range(cols)]
+            for _ in range(rows)]
 
 def random_empty_cell(grid):
     rows = len(grid)
@@ -102,10 +129,10 @@ def random_empty_cell(grid):
 def ensure_reachable(grid, start, goal):
     # quick BFS to check connectivity ignoring mud cost
     rows = len(grid); cols = len(grid[0])
-    q = [start]
+    q = deque([start])
     seen = set([start])
     while q:
-        cr, cc = q.pop(0)
+        cr, cc = q.popleft()
         if (cr, cc) == goal:
             return True
         for dr, dc in [(1,0),(-1,0),(0,1),(0,-1)]:
@@ -116,12 +143,38 @@ def ensure_reachable(grid, start, goal):
                     q.append((nr,nc))
     return False
 
+def label_components(grid):
+    # label 4-connected regions of non-wall cells once per grid (0 = wall);
+    # two cells are mutually reachable iff they share a label
+    rows = len(grid); cols = len(grid[0])
+    labels = [[0] * cols for _ in range(rows)]
+    label = 0
+    for r in range(rows):
+        for c in range(cols):
+            if grid[r][c] == TILE_WALL or labels[r][c]:
+                continue
+            label += 1
+            labels[r][c] = label
+            q = deque([(r, c)])
+            while q:
+                cr, cc = q.popleft()
+                for dr, dc in ((1,0),(-1,0),(0,1),(0,-1)):
+                    nr, nc = cr+dr, cc+dc
+                    if 0 <= nr < rows and 0 <= nc < cols:
+                        if grid[nr][nc] != TILE_WALL and not labels[nr][nc]:
+                            labels[nr][nc] = label
+                            q.append((nr, nc))
+    return labels
+
 # Place Ash and Pokéball on an existing grid (tries multiple times; regenerates grid if impossible)
 def place_entities_on_grid(rows, cols, wall_prob, mud_prob, seed=None):
     attempts = 0
     tries_since_regen = 0
     # generate initial grid
     grid = generate_grid(rows, cols, wall_prob, mud_prob, seed)
+    # the first pair on a grid is usually reachable, so try an early-exit BFS first and only
+    # label the whole grid once a pair fails (later attempts are then a label compare)
+    labels = None
     while True:
         # try to pick start and goal on non-wall cells
         start = random_empty_cell(grid)
@@ -132,9 +185,16 @@ def place_entities_on_grid(rows, cols, wall_prob, mud_prob, seed=None):
             if tries_since_regen > MAX_PLACE_TRIES:
                 # regenerate grid and reset tries
                 grid = generate_grid(rows, cols, wall_prob, mud_prob, None)
+                labels = None
                 tries_since_regen = 0
             continue
-        if ensure_reachable(grid, start, goal):
+        if labels is None:
+            reachable = ensure_reachable(grid, start, goal)
+            if not reachable:
+                labels = label_components(grid)
+        else:
+            reachable = labels[start[0]][start[1]] == labels[goal[0]][goal[1]]
+        if reachable:
             logger.log(f"Placed Ash at {start} and Pokéball at {goal} on existing grid.")
             return grid, start, goal
         else:
@@ -144,88 +204,111 @@ def place_entities_on_grid(rows, cols, wall_prob, mud_prob, seed=None):
                 # regenerate grid and reset tries
                 logger.log("Could not find reachable start/goal on current grid after many attempts; regenerating grid.")
                 grid = generate_grid(rows, cols, wall_prob, mud_prob, None)
+                labels = None
                 tries_since_regen = 0
 
+def reconstruct_path(parent, idx, cols):
+    # follow packed parent indices back to the start (parent -1) and decode to (r, c)
+    path = [idx]
+    while parent[path[-1]] != -1:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return [divmod(i, cols) for i in path]
+
 # --- A* implementation with optional step recording ---
 def astar(grid, start, goal, record_steps=False):
     rows = len(grid); cols = len(grid[0])
-    g = {start: 0}
-    parent = {}
-    open_heap = []
+    inf = float('inf')
+    # nodes are packed as r*cols + c; g-scores and parents are flat arrays over them
+    sidx = start[0]*cols + start[1]
+    gidx = goal[0]*cols + goal[1]
+    n = rows * cols
+    # per-cell step cost, built once (at C speed) so the inner loop is a single index
+    cost = ''.join(map(''.join, grid)).encode('ascii').translate(COST_TABLE)
+    gr, gc = goal
+    offsets = (cols, -cols, 1, -1)  # down, up, right, left
+    g = [inf] * n
+    parent = [-1] * n
+    g[sidx] = 0
     # priority = f, tie-breaker: g (lower g preferred)
-    heapq.heappush(open_heap, (manhattan(start, goal), 0, start))
-    open_set = {start}
-    closed_set = set()
-    steps = []  # each step: snapshot of (open_set, closed_set, current, g)
+    open_heap = [(abs(start[0] - gr) + abs(start[1] - gc), 0, sidx)]
+    expanded = 0
+    # hot-loop names bound to locals (avoids global/attribute lookups per edge)
+    push = heapq.heappush
+    pop = heapq.heappop
+    steps = []  # each step: (current, [(cell, new g), ...]) -- deltas, see replay_steps()
 
     while open_heap:
-        f, _, current = heapq.heappop(open_heap)
-        if current in closed_set:
+        f, popped_g, cur = pop(open_heap)
+        # with a consistent heuristic the first pop of the goal carries its best g
+        if cur == gidx:
+            if record_steps:
+                steps.append((divmod(cur, cols), []))
+            return {'path': reconstruct_path(parent, cur, cols), 'expanded': expanded + 1, 'steps': steps}
+        # stale entry: a cheaper g for this node was pushed after this one
+        if g[cur] < popped_g:
             continue
-        open_set.discard(current)
-        closed_set.add(current)
+        expanded += 1
 
         if record_steps:
-            steps.append({
-                'current': current,
-                'open': set(open_set),
-                'closed': set(closed_set),
-                'g': g.copy()
-            })
-
-        if current == goal:
-            # reconstruct path
-            path = []
-            cur = current
-            while cur != start:
-                path.append(cur)
-                cur = parent[cur]
-            path.append(start)
-            path.reverse()
-            return {'path': path, 'expanded': len(closed_set), 'steps': steps}
-
-        cr, cc = current
-        for dr, dc in ((1,0),(-1,0),(0,1),(0,-1)):
-            nr, nc = cr+dr, cc+dc
-            if not (0 <= nr < rows and 0 <= nc < cols):
+            g_updates = []
+            steps.append((divmod(cur, cols), g_updates))
+
+        cr, cc = divmod(cur, cols)
+        for step in offsets:
+            nidx = cur + step
+            if not (0 <= nidx < n):
+                continue
+            nr, nc = divmod(nidx, cols)
+            # +/-1 must stay on the same row (no wrap-around to the next/previous row)
+            if nr != cr and nc != cc:
                 continue
-            if grid[nr][nc] == TILE_WALL:
+            ci = cost[nidx]
+            if ci == COST_WALL:
                 continue
-            neighbor = (nr, nc)
-            tentative_g = g[current] + COSTS.get(grid[nr][nc], 1)
-            if tentative_g < g.get(neighbor, float('inf')):
-                g[neighbor] = tentative_g
-                parent[neighbor] = current
-                fscore = tentative_g + manhattan(neighbor, goal)
-                heapq.heappush(open_heap, (fscore, tentative_g, neighbor))
-                open_set.add(neighbor)
+            tentative_g = popped_g + ci
+            if tentative_g < g[nidx]:
+                g[nidx] = tentative_g
+                parent[nidx] = cur
+                fscore = tentative_g + abs(nr - gr) + abs(nc - gc)
+                push(open_heap, (fscore, tentative_g, nidx))
+                if record_steps:
+                    g_updates.append((divmod(nidx, cols), tentative_g))
     return None  # no path
 
+def replay_steps(steps):
+    # rebuild full snapshots (current, open, closed, g) from astar's per-step deltas;
+    # the yielded sets/dict are updated in place, so copy them if they must be kept
+    open_set, closed_set, g = set(), set(), {}
+    for current, g_updates in steps:
+        if not g:
+            g[current] = 0  # first expansion is the start
+        open_set.discard(current)
+        closed_set.add(current)
+        yield {'current': current, 'open': open_set, 'closed': closed_set, 'g': g}
+        for cell, cost in g_updates:
+            g[cell] = cost
+            open_set.add(cell)
+
 # --- Rendering ---
 def render(grid, start=None, goal=None, path=None, open_set=None, closed_set=None):
     rows = len(grid); cols = len(grid[0])
-    out_lines = []
-    path_set = set(path) if path else set()
-    for r in range(rows):
-        row_chars = []
-        for c in range(cols):
-            pos = (r,c)
-            if pos == start:
-                ch = TILE_ASH
-            elif pos == goal:
-                ch = TILE_POKEBALL
-            elif pos in path_set and pos != start and pos != goal:
-                ch = TILE_PATH
-            else:
-                ch = grid[r][c]
-            # overlay open/closed
-            if open_set and pos in open_set and ch not in (TILE_ASH, TILE_POKEBALL, TILE_PATH):
-                ch = 'o' if ch != TILE_WALL else ch
-            if closed_set and pos in closed_set and ch not in (TILE_ASH, TILE_POKEBALL, TILE_PATH):
-                ch = 'x' if ch != TILE_WALL else ch
-            row_chars.append(ch)
-        out_lines.append(''.join(row_chars))
-    return '\n'.join(out_lines)
+    # flat ASCII buffer indexed by r*cols + c; later layers overwrite earlier ones
+    ba = bytearray(''.join(''.join(row) for row in grid), 'ascii')
+    wall = ord(TILE_WALL)
+    # overlay open/closed (closed wins), never on walls
+    for cells, mark in ((open_set, ord('o')), (closed_set, ord('x'))):
+        for r, c in cells or ():
+            i = r*cols + c
+            if ba[i] != wall:
+                ba[i] = mark
+    for r, c in path or ():
+        ba[r*cols + c] = ord(TILE_PATH)
+    if goal is not None:
+        ba[goal[0]*cols + goal[1]] = ord(TILE_POKEBALL)
+    if start is not None:
+        ba[start[0]*cols + start[1]] = ord(TILE_ASH)
+    return '\n'.join(ba[r*cols:(r+1)*cols].decode('ascii') for r in range(rows))
 
 # Helper to write grid + small description to file
 def write_grid_snapshot(filehandle, title, grid, start=None, goal=None, path=None, open_set=None, closed_set=None):
@@ -278,11 +361,14 @@ def main():
 
         # If ANIMATE then log all recorded A* steps (this can be long)
         if ANIMATE:
-            f.write("\nA* expansion steps (chronological):\n")
-            for i, st in enumerate(res['steps']):
-                f.write(f"\nStep {i+1}: current={st['current']}, open_size={len(st['open'])}, closed_size={len(st['closed'])}\n")
+            # build the whole dump in memory and write it once
+            buf = io.StringIO()
+            buf.write("\nA* expansion steps (chronological):\n")
+            for i, st in enumerate(replay_steps(res['steps'])):
+                buf.write(f"\nStep {i+1}: current={st['current']}, open_size={len(st['open'])}, closed_size={len(st['closed'])}\n")
                 # write a compact snapshot (open as 'o', closed as 'x')
-                f.write(render(grid, start=start, goal=goal, path=None, open_set=st['open'], closed_set=st['closed']) + "\n")
+                buf.write(render(grid, start=start, goal=goal, path=None, open_set=st['open'], closed_set=st['closed']) + "\n")
+            f.write(buf.getvalue())
 
         # Write full path coordinates:
         f.write("\nPath coordinates from start -> goal (ordered):\n")
@@ -294,10 +380,10 @@ def main():
 
     if ANIMATE:
         logger.log("Animating A* expansion in terminal (also recorded to file).", console=True)
-        for st in res['steps']:
-            clear_console()
-            print("A* animation: current={}, expanded={}".format(st['current'], len(st['closed'])))
-            print(render(grid, start=start, goal=goal, path=None, open_set=st['open'], closed_set=st['closed']))
+        frame = None
+        for st in replay_steps(res['steps']):
+            header = "A* animation: current={}, expanded={}".format(st['current'], len(st['closed']))
+            frame = draw_frame(header + "\n" + render(grid, start=start, goal=goal, path=None, open_set=st['open'], closed_set=st['closed']), frame)
             time.sleep(0.06)
         time.sleep(0.4)
 
@@ -314,18 +400,21 @@ def main():
     print("\nPress Enter to watch Ash walk to the Pokéball...")
     input()
     logger.log("Animating Ash's movement along the path (recorded moves follow).", console=True)
+    # collect the move snapshots in memory during the animation; written once afterwards
+    buf = io.StringIO()
+    buf.write("\nAsh walking animation (sequence of positions and snapshots):\n")
+    frame = None
+    for i, pos in enumerate(path):
+        subpath = path[:i+1]
+        snapshot = render(grid, start=path[i], goal=goal, path=subpath)
+        frame = draw_frame(snapshot, frame)
+        # log move
+        buf.write(f"\nMove {i+1}/{len(path)} - Ash at {pos}\n")
+        buf.write(snapshot + "\n")
+        time.sleep(0.12)
     with open(OUTFILE, 'a', encoding='utf-8') as f:
-        f.write("\nAsh walking animation (sequence of positions and snapshots):\n")
-        for i, pos in enumerate(path):
-            clear_console()
-            subpath = path[:i+1]
-            print(render(grid, start=path[i], goal=goal, path=subpath))
-            # log move
-            f.write(f"\nMove {i+1}/{len(path)} - Ash at {pos}\n")
-            f.write(render(grid, start=path[i], goal=goal, path=subpath) + "\n")
-            time.sleep(0.12)
-    clear_console()
-    print(render(grid, start=goal, goal=goal, path=path))
+        f.write(buf.getvalue())
+    draw_frame(render(grid, start=goal, goal=goal, path=path), frame)
     print("\nAsh reached the Pokéball!")
     logger.log("Ash reached the Pokéball. End of run.", console=True)
 